@@ -1,9 +1,20 @@
 import streamlit as st
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from sqlalchemy import create_engine
 from tqdm import tqdm
 import time
 import math
+import contextlib
+
+from upload_utils import (
+    PREVIEW_ROWS,
+    map_file,
+    read_csv_preview,
+    remove_spooled_upload,
+    spool_upload,
+)
 
 st.set_page_config(
     page_title="Data Ingestion Tool",
@@ -66,6 +77,9 @@ if st.button("🚀 Start Ingestion", type="primary", use_container_width=True):
     elif not table_name:
         st.error("⚠️ Please provide a table name!")
     else:
+        spooled_path = None
+        mapped_source = None
+        df_iter = None
         try:
             # Create progress indicators
             progress_bar = st.progress(0)
@@ -85,71 +99,119 @@ if st.button("🚀 Start Ingestion", type="primary", use_container_width=True):
                 file_source = url
             else:
                 is_parquet = file_data.name.endswith('.parquet')
-                file_source = file_data
+                if not is_parquet:
+                    # Preview from the first block of the upload, before any full-file pass
+                    preview_df = read_csv_preview(file_data)
+                    st.subheader("Sample Data Preview")
+                    st.dataframe(preview_df, use_container_width=True)
+                status_text.text("Spooling upload to disk...")
+                spooled_path = spool_upload(file_data)
+                file_source = spooled_path
             
             if is_parquet:
-                status_text.text("Reading Parquet file...")
-                df = pd.read_parquet(file_source)
+                parquet_chunk_size = 5000
+                if source_type == "URL":
+                    status_text.text("Reading Parquet file...")
+                    full_df = pd.read_parquet(file_source)
+                    total_rows = len(full_df)
+                    schema_df = full_df.head(n=0)
+                    chunk_iter = (
+                        full_df.iloc[start_idx:start_idx + parquet_chunk_size]
+                        for start_idx in range(0, total_rows, parquet_chunk_size)
+                    )
+                else:
+                    # Memory-map the spooled file and stream record batches;
+                    # the row count and schema come from the footer metadata,
+                    # which sits at the end of the file, so this has to wait
+                    # for the spool to finish
+                    status_text.text("Opening Parquet file...")
+                    mapped_source = pa.memory_map(file_source)
+                    parquet_file = pq.ParquetFile(mapped_source)
+                    total_rows = parquet_file.metadata.num_rows
+                    schema_df = parquet_file.schema_arrow.empty_table().to_pandas()
+                    chunk_iter = (
+                        batch.to_pandas()
+                        for batch in parquet_file.iter_batches(batch_size=parquet_chunk_size)
+                    )
+                total_chunks = max(1, math.ceil(total_rows / parquet_chunk_size))
                 progress_bar.progress(50)
                 
+                # First chunk drives the preview; a zero-row file has no batches
+                df = next(chunk_iter, None)
+                preview_df = schema_df if df is None else df.head(PREVIEW_ROWS).copy()
+                st.subheader("Sample Data Preview")
+                st.dataframe(preview_df, use_container_width=True)
+                
+                # Column types come from the full file schema, not the first chunk
                 status_text.text("Creating table schema...")
-                df.head(n=0).to_sql(name=table_name, con=engine, if_exists='replace')
+                schema_df.to_sql(name=table_name, con=engine, if_exists='replace')
                 progress_bar.progress(60)
                 
                 # Insert in chunks to avoid memory issues
-                total_rows = len(df)
-                parquet_chunk_size = 5000
-                total_chunks = max(1, math.ceil(total_rows / parquet_chunk_size))
                 status_text.text(f"Inserting chunks: 0/{total_chunks} (0%)")
+                chunk_count = 0
+                while df is not None:
+                    chunk_count += 1
+                    df.to_sql(name=table_name, con=engine, if_exists='append', index=False)
+                    percent = min(int((chunk_count / total_chunks) * 100), 100)
+                    status_text.text(f"Inserting chunks: {chunk_count}/{total_chunks} ({percent}%)")
+                    progress_bar.progress(min(60 + int((chunk_count / total_chunks) * 40), 100))
+                    df = next(chunk_iter, None)
                 
-                for chunk_index in range(total_chunks):
-                    start_idx = chunk_index * parquet_chunk_size
-                    end_idx = min(start_idx + parquet_chunk_size, total_rows)
-                    chunk_df = df.iloc[start_idx:end_idx]
-                    chunk_df.to_sql(name=table_name, con=engine, if_exists='append', index=False)
-                    del chunk_df
-                    percent = int(((chunk_index + 1) / total_chunks) * 100)
-                    status_text.text(f"Inserting chunks: {chunk_index + 1}/{total_chunks} ({percent}%)")
-                    progress_bar.progress(min(60 + int(((chunk_index + 1) / total_chunks) * 40), 100))
-                
+                if source_type == "URL":
+                    del full_df
                 progress_bar.progress(100)
                 
             else:
-                status_text.text("Counting rows for progress...")
-                total_rows = 0
-                count_iter = pd.read_csv(file_source, usecols=[0], chunksize=chunk_size)
-                for count_chunk in count_iter:
-                    total_rows += len(count_chunk)
-                total_chunks = max(1, math.ceil(total_rows / chunk_size))
+                if source_type == "URL":
+                    status_text.text("Counting rows for progress...")
+                    total_rows = 0
+                    count_iter = pd.read_csv(file_source, usecols=[0], chunksize=chunk_size)
+                    for count_chunk in count_iter:
+                        total_rows += len(count_chunk)
+                    total_chunks = max(1, math.ceil(total_rows / chunk_size))
+                    csv_source = file_source
+                else:
+                    # Progress follows the parser's byte offset in the memory map,
+                    # so no pass over the file is needed up front
+                    mapped_source = map_file(file_source)
+                    total_bytes = max(1, len(mapped_source))
+                    csv_source = mapped_source
 
-                if source_type == "File Upload":
-                    file_source.seek(0)
+                def chunk_progress(chunk_count):
+                    if source_type == "URL":
+                        return chunk_count / total_chunks, f"{chunk_count}/{total_chunks}"
+                    return mapped_source.tell() / total_bytes, f"{chunk_count}"
 
                 status_text.text("Reading CSV file...")
-                df_iter = pd.read_csv(file_source, iterator=True, chunksize=chunk_size)
+                df_iter = pd.read_csv(csv_source, iterator=True, chunksize=chunk_size)
                 
-                # First chunk
+                # First chunk drives the schema (and the preview for URLs)
                 df = next(df_iter)
+                if source_type == "URL":
+                    preview_df = df.head(PREVIEW_ROWS).copy()
+                    st.subheader("Sample Data Preview")
+                    st.dataframe(preview_df, use_container_width=True)
                 progress_bar.progress(20)
                 
                 status_text.text("Creating table schema...")
                 df.head(n=0).to_sql(name=table_name, con=engine, if_exists='replace')
                 progress_bar.progress(30)
                 
-                status_text.text(f"Inserting chunk 1/{total_chunks} (0%)")
-                df.to_sql(name=table_name, con=engine, if_exists='append', index=False)
-                ingested_rows = len(df)
-                
-                # Process remaining chunks
-                chunk_count = 1
-                for df in df_iter:
+                # Process chunks, starting with the one already read
+                chunk_count = 0
+                ingested_rows = 0
+                while df is not None:
                     chunk_count += 1
                     df.to_sql(name=table_name, con=engine, if_exists='append', index=False)
                     ingested_rows += len(df)
-                    percent = int((chunk_count / total_chunks) * 100)
-                    status_text.text(f"Inserting chunk {chunk_count}/{total_chunks} ({percent}%)")
-                    progress_bar.progress(min(30 + int((chunk_count / total_chunks) * 70), 100))
+                    fraction, label = chunk_progress(chunk_count)
+                    percent = min(int(fraction * 100), 100)
+                    status_text.text(f"Inserting chunk {label} ({percent}%)")
+                    progress_bar.progress(min(30 + int(fraction * 70), 100))
+                    df = next(df_iter, None)
                 
+                total_rows = ingested_rows
                 progress_bar.progress(100)
             
             end_time = time.time()
@@ -170,15 +232,9 @@ if st.button("🚀 Start Ingestion", type="primary", use_container_width=True):
             
             st.success(f"✅ Successfully ingested {total_rows:,} rows into table '{table_name}' in {elapsed_time:.2f} seconds!")
             
-            # Show sample data (only first 10 rows to save memory)
-            st.subheader("Sample Data Preview")
-            sample_df = df.head(10).copy()
-            st.dataframe(sample_df, use_container_width=True)
-            
             # Clean up memory
             del df
-            if 'sample_df' in locals():
-                del sample_df
+            del preview_df
             import gc
             gc.collect()
             
@@ -196,6 +252,16 @@ if st.button("🚀 Start Ingestion", type="primary", use_container_width=True):
                 engine.dispose()
             except:
                 pass
+        finally:
+            # Callbacks run in reverse order and all of them run even if one raises,
+            # so the readers are released first and the spooled upload is always removed
+            with contextlib.ExitStack() as cleanup:
+                if spooled_path:
+                    cleanup.callback(remove_spooled_upload, spooled_path)
+                if mapped_source is not None:
+                    cleanup.callback(mapped_source.close)
+                if df_iter is not None:
+                    cleanup.callback(df_iter.close)
 
 # Footer
 st.markdown("---")
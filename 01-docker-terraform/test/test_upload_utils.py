@@ -0,0 +1,100 @@
+import io
+import os
+
+import pandas as pd
+import pytest
+
+from upload_utils import map_file, read_csv_preview, remove_spooled_upload, spool_upload
+
+
+class FakeUpload(io.BytesIO):
+    """Stand-in for Streamlit's UploadedFile: a BytesIO with a file name."""
+
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+def make_csv(rows):
+    return b"id,note\n" + b"".join(f"{i},row {i}\n".encode() for i in range(rows))
+
+
+def test_spool_upload_copies_in_blocks_and_is_removed():
+    data = make_csv(1000)
+    upload = FakeUpload(data, "trips.csv")
+    upload.read(10)
+
+    path = spool_upload(upload, block_size=64)
+    try:
+        assert path.endswith(".csv")
+        with open(path, "rb") as f:
+            assert f.read() == data
+    finally:
+        remove_spooled_upload(path)
+
+    assert not os.path.exists(path)
+    # Removing twice is a no-op
+    remove_spooled_upload(path)
+
+
+def test_spool_upload_empty_file():
+    path = spool_upload(FakeUpload(b"", "empty.csv"))
+    try:
+        assert os.path.getsize(path) == 0
+    finally:
+        remove_spooled_upload(path)
+    assert not os.path.exists(path)
+
+
+def test_read_csv_preview_uses_first_block_only():
+    upload = FakeUpload(make_csv(10_000), "trips.csv")
+
+    preview = read_csv_preview(upload, block_size=256, nrows=10)
+
+    assert list(preview.columns) == ["id", "note"]
+    assert preview["id"].tolist() == list(range(10))
+    assert upload.tell() == 0
+
+
+def test_read_csv_preview_drops_partial_last_line():
+    # The first block ends mid-row; that row must not show up truncated
+    data = make_csv(100)
+    block_size = data.index(b"\n5,") + 4
+    preview = read_csv_preview(FakeUpload(data, "trips.csv"), block_size=block_size, nrows=10)
+
+    assert preview["id"].tolist() == [0, 1, 2, 3, 4]
+
+
+def test_read_csv_preview_without_trailing_newline():
+    preview = read_csv_preview(FakeUpload(b"id,note\n1,a\n2,b", "trips.csv"))
+
+    assert preview["note"].tolist() == ["a", "b"]
+
+
+def test_read_csv_preview_quoted_embedded_newlines():
+    data = b'id,note\n1,"line one\nline two"\n2,plain\n'
+    preview = read_csv_preview(FakeUpload(data, "trips.csv"))
+
+    assert len(preview) == 2
+    assert preview["note"].tolist() == ["line one\nline two", "plain"]
+
+
+def test_read_csv_preview_empty_file():
+    with pytest.raises(pd.errors.EmptyDataError):
+        read_csv_preview(FakeUpload(b"", "empty.csv"))
+
+
+def test_map_file_chunked_read_tracks_byte_offset(tmp_path):
+    path = tmp_path / "trips.csv"
+    rows = [f'{i},"note\n{i}"\n' for i in range(500)]
+    path.write_bytes(b"id,note\n" + "".join(rows).encode())
+
+    mapped = map_file(str(path))
+    try:
+        total = 0
+        for chunk in pd.read_csv(mapped, chunksize=100):
+            total += len(chunk)
+        assert total == 500
+        assert mapped.tell() == len(mapped)
+    finally:
+        mapped.close()
@@ -0,0 +1,55 @@
+"""Helpers for spooling Streamlit uploads to disk and reading them back."""
+
+import io
+import mmap
+import os
+import tempfile
+
+import pandas as pd
+
+# Uploads are copied to disk in blocks of this size
+UPLOAD_BLOCK_SIZE = 8 * 1024 * 1024
+
+# Rows shown in the sample data preview
+PREVIEW_ROWS = 10
+
+
+def read_csv_preview(uploaded_file, block_size=UPLOAD_BLOCK_SIZE, nrows=PREVIEW_ROWS):
+    """Parse the first rows of a CSV upload from its first block only."""
+    uploaded_file.seek(0)
+    block = uploaded_file.read(block_size)
+    uploaded_file.seek(0)
+
+    # A full block usually ends mid-line; drop the partial line so it isn't parsed as a row
+    if len(block) == block_size:
+        cut = block.rfind(b'\n')
+        if cut != -1:
+            block = block[:cut + 1]
+    return pd.read_csv(io.BytesIO(block), nrows=nrows)
+
+
+def spool_upload(uploaded_file, block_size=UPLOAD_BLOCK_SIZE):
+    """Copy an uploaded file to a temp file in fixed-size blocks and return its path."""
+    suffix = os.path.splitext(uploaded_file.name)[1]
+    uploaded_file.seek(0)
+    with tempfile.NamedTemporaryFile(prefix="ingest_", suffix=suffix, delete=False) as tmp:
+        while True:
+            block = uploaded_file.read(block_size)
+            if not block:
+                break
+            tmp.write(block)
+    return tmp.name
+
+
+def map_file(path):
+    """Memory-map a file read-only; the mapping stays valid after the handle is closed."""
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def remove_spooled_upload(path):
+    """Delete a spooled upload, ignoring files that are already gone."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,164 @@
+import gzip
+import io
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+import requests
+
+import trips
+
+
+def make_csv(rows):
+    return b"VendorID,trip_distance\n" + b"".join(f"{i % 2 + 1},{i}.5\n".encode() for i in range(rows))
+
+
+def make_parquet(rows):
+    buf = io.BytesIO()
+    pd.DataFrame({"VendorID": [1] * rows, "trip_distance": [0.5] * rows}).to_parquet(buf)
+    return buf.getvalue()
+
+
+class FixtureServer:
+    """Local HTTP stand-in serving fixture payloads by path."""
+
+    def __init__(self):
+        self.routes = {}
+        # Paths whose next N responses advertise the full length but drop mid-body
+        self.drops = {}
+        self.hits = {}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.hits[self.path] = server.hits.get(self.path, 0) + 1
+                body = server.routes.get(self.path)
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if server.drops.get(self.path, 0) > 0:
+                    server.drops[self.path] -= 1
+                    self.wfile.write(body[: len(body) // 2])
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}{path}"
+
+
+@pytest.fixture
+def server():
+    srv = FixtureServer()
+    srv.thread.start()
+    yield srv
+    srv.httpd.shutdown()
+    srv.httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def no_retry_sleep(monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+
+
+def stream_batches(url, source_format, chunksize):
+    with requests.get(url, timeout=10, stream=True) as resp:
+        resp.raise_for_status()
+        return list(trips.iter_source_batches(resp, source_format, chunksize=chunksize))
+
+
+def test_csv_gz_is_parsed_in_batches(server):
+    server.routes["/yellow.csv.gz"] = gzip.compress(make_csv(2500))
+
+    batches = stream_batches(server.url("/yellow.csv.gz"), "csv_gz", chunksize=1000)
+
+    assert [len(b) for b in batches] == [1000, 1000, 500]
+    assert list(batches[0].columns) == ["VendorID", "trip_distance"]
+    assert batches[-1]["trip_distance"].iloc[-1] == 2499.5
+
+
+def test_plain_csv_is_parsed_in_batches(server):
+    server.routes["/yellow.csv"] = make_csv(1200)
+
+    batches = stream_batches(server.url("/yellow.csv"), "csv", chunksize=500)
+
+    assert [len(b) for b in batches] == [500, 500, 200]
+
+
+def test_parquet_is_spooled_and_temp_file_removed(server, monkeypatch):
+    server.routes["/yellow.parquet"] = make_parquet(300)
+    spooled = []
+    real_mkstemp = tempfile.mkstemp
+
+    def recording_mkstemp(*args, **kwargs):
+        fd, path = real_mkstemp(*args, **kwargs)
+        spooled.append(path)
+        return fd, path
+
+    monkeypatch.setattr(tempfile, "mkstemp", recording_mkstemp)
+
+    batches = stream_batches(server.url("/yellow.parquet"), "parquet", chunksize=100)
+
+    assert sum(len(b) for b in batches) == 300
+    assert len(spooled) == 1
+    assert not os.path.exists(spooled[0])
+
+
+def test_truncated_gzip_raises(server):
+    payload = gzip.compress(make_csv(50_000))
+    server.routes["/yellow.csv.gz"] = payload[: len(payload) // 2]
+
+    with pytest.raises(EOFError):
+        stream_batches(server.url("/yellow.csv.gz"), "csv_gz", chunksize=1000)
+
+
+def test_fetch_source_retries_dropped_connection(server):
+    server.routes["/yellow.csv.gz"] = gzip.compress(make_csv(5000))
+    server.drops["/yellow.csv.gz"] = 1
+
+    df = trips.fetch_source(server.url("/yellow.csv.gz"), "csv_gz", chunksize=1000)
+
+    assert server.hits["/yellow.csv.gz"] == 2
+    assert len(df) == 5000
+
+
+def test_fetch_source_returns_none_for_missing_source(server):
+    assert trips.fetch_source(server.url("/missing.csv"), "csv") is None
+
+
+def test_materialize_discards_partial_rows_from_truncated_gzip(server, monkeypatch):
+    # First mirror serves a gzip cut short after several batches; second mirror is complete
+    payload = gzip.compress(make_csv(300_000))
+    server.routes["/green_tripdata_2019-01.csv.gz"] = payload[: len(payload) // 2]
+    server.routes["/green_tripdata_2019-01.csv"] = make_csv(7)
+
+    real_get = requests.get
+
+    def local_get(url, **kwargs):
+        # Route every mirror to the stand-in by file name
+        return real_get(server.url("/" + url.rsplit("/", 1)[-1]), **kwargs)
+
+    monkeypatch.setattr(requests, "get", local_get)
+    monkeypatch.setenv("BRUIN_START_DATE", "2019-01-01")
+    monkeypatch.setenv("BRUIN_END_DATE", "2019-01-31")
+    monkeypatch.setenv("BRUIN_VARS", '{"taxi_types": ["green"]}')
+
+    df = trips.materialize()
+
+    assert len(df) == 7
+    assert df["_source_url"].str.endswith("green_tripdata_2019-01.csv").all()
@@ -19,6 +19,85 @@ materialization:
 
 
 
+# Size of the blocks read off the HTTP stream when spooling Parquet to disk
+STREAM_BLOCK_SIZE = 1024 * 1024
+
+# Rows per DataFrame batch emitted by the streaming CSV parser
+CSV_CHUNK_ROWS = 100_000
+
+# Attempts per source URL; each one covers the request and the full streamed parse
+FETCH_ATTEMPTS = 3
+
+
+def iter_source_batches(resp, source_format, chunksize=CSV_CHUNK_ROWS):
+    """
+    Parse a streamed HTTP response (requests.get(..., stream=True)) into DataFrame batches.
+
+    CSV payloads, plain or gzipped, are decompressed and parsed while the body is still
+    downloading, so the first batch is ready before the transfer finishes and the raw
+    bytes are never held in memory as one block.
+    Parquet needs its footer before any row can be read, so it is spooled to a temp file
+    in fixed-size blocks and read back through a memory map.
+    """
+    import gzip
+    import os
+    import tempfile
+    import pandas as pd
+
+    if source_format == "parquet":
+      fd, path = tempfile.mkstemp(suffix=".parquet")
+      try:
+        with os.fdopen(fd, "wb") as tmp:
+          for block in resp.iter_content(chunk_size=STREAM_BLOCK_SIZE):
+            tmp.write(block)
+        yield pd.read_parquet(path, memory_map=True)
+      finally:
+        os.remove(path)
+      return
+
+    # Let urllib3 undo any transport Content-Encoding; the .gz file layer is handled below
+    resp.raw.decode_content = True
+    stream = resp.raw
+    if source_format == "csv_gz":
+      stream = gzip.GzipFile(fileobj=resp.raw)
+
+    with pd.read_csv(stream, chunksize=chunksize) as reader:
+      for chunk in reader:
+        yield chunk
+
+
+def fetch_source(url, source_format, chunksize=CSV_CHUNK_ROWS, timeout=90, attempts=FETCH_ATTEMPTS):
+    """
+    Download and parse one source URL into a single DataFrame.
+
+    Each attempt covers both the request and the whole streamed parse, so a connection
+    dropped mid-download is retried on the same URL and the batches of the failed attempt
+    are discarded. Returns None for a non-200 response; parse errors propagate so the
+    caller can fall back to the next mirror.
+    """
+    import time
+    import pandas as pd
+    import requests
+    import urllib3
+
+    for attempt in range(1, attempts + 1):
+      try:
+        with requests.get(url, timeout=timeout, stream=True) as resp:
+          if resp.status_code != 200:
+            print(f"Source not available at {url}: status={resp.status_code}")
+            return None
+          batches = list(iter_source_batches(resp, source_format, chunksize))
+        # One frame per source, so the batch list is released before the next fetch
+        return pd.concat(batches, ignore_index=True)
+      except (requests.RequestException, urllib3.exceptions.HTTPError) as e:
+        # Reading resp.raw surfaces urllib3 errors (read timeouts, truncated bodies)
+        # unwrapped, so both families count as transient
+        print(f"Request error for {url} (attempt {attempt}/{attempts}): {e}")
+        if attempt == attempts:
+          raise
+        time.sleep(2 * attempt)
+
+
 # TODO: Only implement `materialize()` if you are using Bruin Python materialization.
 # If you choose the manual-write approach (no `materialization:` block), remove this function and implement ingestion
 # as a standard Python script instead.
@@ -40,15 +119,17 @@ def materialize():
     - Fetch data for each endpoint, parse into DataFrames, and concatenate.
     - Add a column like `extracted_at` for lineage/debugging (timestamp of extraction).
     - Prefer append-only in ingestion; handle duplicates in staging.
+
+    Sources are streamed and parsed incrementally (see fetch_source), so raw response
+    bytes are never buffered whole. Bruin materialization takes a single DataFrame,
+    though, so every parsed month is still kept until the final concat: the memory
+    saving is the download buffer and the per-source batch lists, not the parsed data.
     """
     import os
     import json
-    import io
     from datetime import datetime, date
-    import time
     from dateutil.relativedelta import relativedelta
     import pandas as pd
-    import requests
 
     # Helpers
     def parse_date(s: str) -> date:
@@ -107,43 +188,23 @@ def materialize():
         sources = build_sources(taxi, year, month)
         for source in sources:
           url = source["url"]
-          source_format = source["format"]
-          resp = None
-          for attempt in range(1, 4):
-            try:
-              resp = requests.get(url, timeout=90)
-              break
-            except Exception as e:
-              print(f"Request error for {url} (attempt {attempt}/3): {e}")
-              if attempt < 3:
-                time.sleep(2 * attempt)
-          if resp is None:
+          try:
+            df = fetch_source(url, source["format"])
+          except Exception as e:
+            print(f"Failed fetching payload from {url}: {e}")
             continue
-
-          if resp.status_code == 200:
-            try:
-              bio = io.BytesIO(resp.content)
-              if source_format == "parquet":
-                df = pd.read_parquet(bio)
-              elif source_format == "csv_gz":
-                df = pd.read_csv(bio, compression="gzip")
-              else:
-                df = pd.read_csv(bio)
-              df["extracted_at"] = extracted_at
-              df["_source_url"] = url
-              df["taxi_type"] = taxi
-              dataframes.append(df)
-              fetched = True
-              print(f"Fetched {url} rows={len(df)}")
-              break
-            except Exception as e:
-              print(f"Failed parsing payload from {url}: {e}")
-              continue
-          else:
-            print(f"Source not available at {url}: status={resp.status_code}")
+          if df is None:
             # try next template or skip
             continue
 
+          df["extracted_at"] = extracted_at
+          df["_source_url"] = url
+          df["taxi_type"] = taxi
+          dataframes.append(df)
+          fetched = True
+          print(f"Fetched {url} rows={len(df)}")
+          break
+
         if not fetched:
           print(f"No data available for {month_label} (checked {len(sources)} sources)")
 